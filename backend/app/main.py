@@ -3,7 +3,7 @@ Sistema de Detección de Armas - Backend API
 Procesa video en tiempo real y envía alertas automáticas
 """
 
-from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import cv2
@@ -11,14 +11,23 @@ import numpy as np
 from ultralytics import YOLO
 import base64
 import asyncio
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import logging
 from pydantic import BaseModel
 import os
 
 from .utils.alert_manager import AlertManager
 from .utils.detection_logger import DetectionLogger
+from .utils.roi_manager import RegionOfInterestManager
+from .utils.model_cascade import ModelCascade
+from .utils.inference import parse_result, offset_detections
+from .utils.stream_controller import StreamRateController
+from .utils.event_hub import EventHub
+from .utils.model_pool import ModelReplicaPool
+from .utils.decode_pool import SharedDecodePool
+from .utils.evidence_recorder import EvidenceRecorder
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
@@ -44,19 +53,127 @@ app.add_middleware(
 MODEL_PATH = os.getenv("MODEL_PATH", "../runs/detect/train/weights/best.pt")
 CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.4"))
 
-try:
-    model = YOLO(MODEL_PATH)
-    logger.info(f"✅ Modelo cargado exitosamente desde {MODEL_PATH}")
-except Exception as e:
-    logger.error(f"❌ Error al cargar el modelo: {e}")
-    model = None
+# Cascada screener → confirmer (opcional)
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+SCREENER_MODEL_PATH = os.getenv("SCREENER_MODEL_PATH")
+SCREENER_CONFIDENCE = float(os.getenv("SCREENER_CONFIDENCE", "0.15"))
+SCREENER_IMGSZ = int(os.getenv("SCREENER_IMGSZ", "320"))
+CONFIRMER_MODEL_PATH = os.getenv("CONFIRMER_MODEL_PATH", MODEL_PATH)
+CONFIRMER_CONFIDENCE = float(os.getenv("CONFIRMER_CONFIDENCE", str(CONFIDENCE_THRESHOLD)))
+CONFIRMER_IMGSZ = int(os.getenv("CONFIRMER_IMGSZ", "640"))
+
+if CASCADE_ENABLED and (not SCREENER_MODEL_PATH or SCREENER_MODEL_PATH == CONFIRMER_MODEL_PATH):
+    # Con el mismo modelo en ambas etapas la cascada solo duplica el coste de los positivos
+    logger.warning(
+        "⚠️ Cascada desactivada: SCREENER_MODEL_PATH debe apuntar a un modelo "
+        "distinto (más pequeño) que CONFIRMER_MODEL_PATH"
+    )
+    CASCADE_ENABLED = False
+
+# Pool de réplicas del modelo (1 = modelo único en el event loop)
+MODEL_REPLICAS = int(os.getenv("MODEL_REPLICAS", "1"))
+THREADS_PER_REPLICA = int(os.getenv("THREADS_PER_REPLICA", "0")) or None
+PIN_REPLICA_CORES = os.getenv("PIN_REPLICA_CORES", "false").lower() == "true"
+
+# Solo se cargan los modelos que se usan: con la cascada activa, sus dos etapas;
+# los núcleos se reparten entre esos pools
+MODEL_PATHS = [SCREENER_MODEL_PATH, CONFIRMER_MODEL_PATH] if CASCADE_ENABLED else [MODEL_PATH]
+if MODEL_REPLICAS > 1 and THREADS_PER_REPLICA is None:
+    THREADS_PER_REPLICA = max(1, (os.cpu_count() or 1) // (MODEL_REPLICAS * len(MODEL_PATHS)))
+
+_loaded_models: Dict = {}
+
+
+def load_model(path: str):
+    """
+    Carga un modelo único o un pool de réplicas según MODEL_REPLICAS
+
+    Los modelos se cachean por ruta para no duplicar pools, y cada
+    pool recibe su propio tramo de núcleos.
+    """
+    if path in _loaded_models:
+        return _loaded_models[path]
+
+    if MODEL_REPLICAS > 1:
+        loaded = ModelReplicaPool(
+            path,
+            YOLO,
+            replicas=MODEL_REPLICAS,
+            threads_per_replica=THREADS_PER_REPLICA,
+            pin_cores=PIN_REPLICA_CORES,
+            core_offset=len(_loaded_models) * MODEL_REPLICAS * THREADS_PER_REPLICA
+        )
+    else:
+        loaded = YOLO(path)
+
+    _loaded_models[path] = loaded
+    return loaded
+
+
+# Control adaptativo del stream
+STREAM_MIN_FPS = float(os.getenv("STREAM_MIN_FPS", "1"))
+STREAM_MAX_FPS = float(os.getenv("STREAM_MAX_FPS", "15"))
+STREAM_BOOST_SECONDS = float(os.getenv("STREAM_BOOST_SECONDS", "5"))
+
+# Difusión de eventos a dashboards (Redis opcional para varios workers)
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL")
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+# Procesos de decodificación con memoria compartida (0 = decodificar en el event loop)
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "0"))
+DECODE_SLOTS = int(os.getenv("DECODE_SLOTS", "16"))
+
+# Evidencia pre/post-roll de cada stream
+EVIDENCE_DIR = os.getenv("EVIDENCE_DIR", "evidence")
+EVIDENCE_PRE_ROLL = int(os.getenv("EVIDENCE_PRE_ROLL", "30"))
+EVIDENCE_POST_ROLL = int(os.getenv("EVIDENCE_POST_ROLL", "30"))
+EVIDENCE_MAX_MB_PER_STREAM = float(os.getenv("EVIDENCE_MAX_MB_PER_STREAM", "16"))
+EVIDENCE_MAX_QUEUED_CLIPS = int(os.getenv("EVIDENCE_MAX_QUEUED_CLIPS", "8"))
+
+# Con la cascada activa el modelo principal es el confirmer (MODEL_PATH no se carga aparte)
+model = None
+cascade = None
+if CASCADE_ENABLED:
+    try:
+        cascade = ModelCascade(
+            screener=load_model(SCREENER_MODEL_PATH),
+            confirmer=load_model(CONFIRMER_MODEL_PATH),
+            screener_confidence=SCREENER_CONFIDENCE,
+            confirmer_confidence=CONFIRMER_CONFIDENCE,
+            screener_imgsz=SCREENER_IMGSZ,
+            confirmer_imgsz=CONFIRMER_IMGSZ
+        )
+        model = cascade.confirmer
+        logger.info(f"✅ Cascada cargada: {SCREENER_MODEL_PATH} → {CONFIRMER_MODEL_PATH}")
+    except Exception as e:
+        logger.error(f"❌ Error al cargar la cascada, se usa el modelo único: {e}")
+        cascade = None
+
+if model is None:
+    try:
+        model = load_model(MODEL_PATH)
+        logger.info(f"✅ Modelo cargado exitosamente desde {MODEL_PATH}")
+    except Exception as e:
+        logger.error(f"❌ Error al cargar el modelo: {e}")
+        model = None
 
 # Managers
 alert_manager = AlertManager()
 detection_logger = DetectionLogger()
+roi_manager = RegionOfInterestManager()
+event_hub = EventHub(max_queue=EVENT_QUEUE_SIZE, redis_url=EVENTS_REDIS_URL)
+evidence_recorder = EvidenceRecorder(
+    output_dir=EVIDENCE_DIR,
+    pre_roll_frames=EVIDENCE_PRE_ROLL,
+    post_roll_frames=EVIDENCE_POST_ROLL,
+    max_bytes_per_stream=int(EVIDENCE_MAX_MB_PER_STREAM * 1024 * 1024),
+    max_queued_clips=EVIDENCE_MAX_QUEUED_CLIPS
+)
+decode_pool = SharedDecodePool(workers=DECODE_WORKERS, num_slots=DECODE_SLOTS) if DECODE_WORKERS > 0 else None
 
-# Conexiones WebSocket activas
+# Conexiones WebSocket activas (cámaras) y dashboards suscritos a eventos
 active_connections: List[WebSocket] = []
+dashboard_connections: List[WebSocket] = []
 
 
 # ============================================
@@ -83,6 +200,129 @@ class AlertConfig(BaseModel):
     enable_email: bool = False
 
 
+class ROIConfig(BaseModel):
+    """Regiones de interés de una cámara (polígonos normalizados 0-1)"""
+    polygons: List[List[List[float]]]
+
+
+# ============================================
+# INFERENCIA
+# ============================================
+
+def _predict(images: List[np.ndarray], imgsz: int = None) -> List[List[Dict]]:
+    """
+    Ejecuta el modelo (o la cascada si está activa) sobre un batch
+
+    Args:
+        images: Frames o recortes BGR
+        imgsz: Tamaño de entrada (por defecto el del modelo, 640)
+
+    Returns:
+        Detecciones por imagen
+    """
+    if cascade is not None:
+        return cascade.predict(images, max_imgsz=imgsz)
+
+    results = model(images, conf=CONFIDENCE_THRESHOLD, imgsz=imgsz or 640, verbose=False)
+    return [parse_result(result, model.names) for result in results]
+
+
+def run_detection(img: np.ndarray, camera_id: str = None, content_rect: Tuple = None) -> List[Dict]:
+    """
+    Ejecuta la detección sobre un frame
+
+    Si la cámara tiene ROI configurada, solo se analizan los recortes
+    de sus regiones (en un único batch, a un imgsz acorde al tamaño
+    del recorte) y se descartan las detecciones que caen fuera de los
+    polígonos. Si los recortes no ahorran cómputo frente al frame
+    completo, se analiza el frame entero y solo se filtra.
+
+    Args:
+        img: Frame BGR
+        camera_id: Identificador de la cámara (opcional)
+        content_rect: Zona (x, y, ancho, alto) con el frame real si `img` está en letterbox
+
+    Returns:
+        Detecciones en coordenadas de `img`
+    """
+    if not roi_manager.has_regions(camera_id):
+        return _predict([img])[0]
+
+    height, width = img.shape[:2]
+    content_rect = content_rect or (0, 0, width, height)
+
+    crops = roi_manager.get_crops(img, camera_id, content_rect)
+    if not crops:
+        return []
+
+    imgsz = roi_manager.crop_imgsz(crops)
+    if imgsz is None:
+        return roi_manager.filter_detections(_predict([img])[0], camera_id, content_rect)
+
+    detections = []
+    per_crop = _predict([crop for _, _, crop in crops], imgsz)
+    for (offset_x, offset_y, _), crop_detections in zip(crops, per_crop):
+        detections.extend(offset_detections(crop_detections, offset_x, offset_y))
+
+    return roi_manager.filter_detections(detections, camera_id, content_rect)
+
+
+async def detect(img: np.ndarray, camera_id: str = None, content_rect: Tuple = None) -> List[Dict]:
+    """
+    Ejecuta run_detection sin bloquear el event loop si hay pool
+
+    Con un único modelo la llamada sigue siendo directa: el modelo
+    no admite llamadas concurrentes desde varios hilos.
+    """
+    if MODEL_REPLICAS > 1:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, run_detection, img, camera_id, content_rect)
+    return run_detection(img, camera_id, content_rect)
+
+
+async def detect_base64(frame_base64: str, camera_id: str = None, target_size: Tuple[int, int] = None) -> List[Dict]:
+    """
+    Decodifica un frame base64 y ejecuta la detección
+
+    Con DECODE_WORKERS > 0 la decodificación y el letterbox se hacen
+    en otros procesos sobre memoria compartida y el modelo lee el slot
+    directamente; las cajas se devuelven al sistema de coordenadas
+    del frame original.
+
+    Args:
+        frame_base64: Imagen JPEG en base64
+        camera_id: Identificador de la cámara (opcional)
+        target_size: (ancho, alto) al que se redimensiona el frame (opcional)
+
+    Returns:
+        Detecciones en coordenadas del frame (o de target_size)
+    """
+    if decode_pool is None:
+        img_bytes = base64.b64decode(frame_base64)
+        nparr = np.frombuffer(img_bytes, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if target_size:
+            img = cv2.resize(img, target_size)
+        return await detect(img, camera_id)
+
+    frame = await decode_pool.decode(frame_base64)
+
+    # El modelo lee el slot sin copiarlo: si esta corrutina se cancela, la
+    # inferencia del hilo sigue y el slot se libera recién cuando termina
+    def release_frame(task: asyncio.Task):
+        frame.release()
+        if not task.cancelled():
+            task.exception()  # evita el aviso de excepción no recuperada
+
+    task = asyncio.ensure_future(detect(frame.image, camera_id, frame.content_rect))
+    task.add_done_callback(release_frame)
+    detections = await asyncio.shield(task)
+
+    for det in detections:
+        det["bbox"] = frame.to_frame_coords(det["bbox"], target_size)
+    return detections
+
+
 # ============================================
 # ENDPOINTS PRINCIPALES
 # ============================================
@@ -94,6 +334,7 @@ async def root():
         "status": "online",
         "service": "Weapon Detection API",
         "model_loaded": model is not None,
+        "cascade_enabled": cascade is not None,
         "version": "1.0.0"
     }
 
@@ -123,40 +364,31 @@ async def detect_weapon_in_image(
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
         # Ejecutar detección
-        results = model(img, conf=CONFIDENCE_THRESHOLD)
+        detections = await detect(img)
 
         # Procesar resultados
-        detected = False
+        detected = len(detections) > 0
         bounding_boxes = []
         max_confidence = 0.0
         detected_class = "none"
 
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                class_name = model.names[cls]
-
-                # Extraer coordenadas
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                bounding_boxes.append({
-                    "class": class_name,
-                    "confidence": conf,
-                    "bbox": {
-                        "x1": x1,
-                        "y1": y1,
-                        "x2": x2,
-                        "y2": y2
-                    }
-                })
-
-                if conf > max_confidence:
-                    max_confidence = conf
-                    detected_class = class_name
+        for det in detections:
+            x1, y1, x2, y2 = det["bbox"]
+
+            bounding_boxes.append({
+                "class": det["class"],
+                "confidence": det["confidence"],
+                "bbox": {
+                    "x1": x1,
+                    "y1": y1,
+                    "x2": x2,
+                    "y2": y2
+                }
+            })
 
-                detected = True
+            if det["confidence"] > max_confidence:
+                max_confidence = det["confidence"]
+                detected_class = det["class"]
 
         # Timestamp
         timestamp = datetime.now().isoformat()
@@ -204,7 +436,7 @@ async def detect_weapon_in_frame(
     Optimizado para streaming desde móvil
 
     Args:
-        frame_data: {"frame": "base64_encoded_image"}
+        frame_data: {"frame": "base64_encoded_image", "camera_id": "opcional"}
         alert_config: Configuración de alertas
 
     Returns:
@@ -219,40 +451,20 @@ async def detect_weapon_in_frame(
         if not frame_base64:
             raise HTTPException(status_code=400, detail="Frame no proporcionado")
 
-        # Convertir base64 a imagen
-        img_bytes = base64.b64decode(frame_base64)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Redimensionar para optimizar velocidad (opcional)
-        img = cv2.resize(img, (640, 640))
-
-        # Ejecutar detección
-        results = model(img, conf=CONFIDENCE_THRESHOLD, verbose=False)
-
-        # Procesar resultados
-        detected = False
-        detections = []
-        max_conf = 0.0
-
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                class_name = model.names[cls]
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                detections.append({
-                    "class": class_name,
-                    "confidence": round(conf, 3),
-                    "bbox": [int(x1), int(y1), int(x2), int(y2)]
-                })
-
-                if conf > max_conf:
-                    max_conf = conf
-
-                detected = True
+        # Decodificar (cajas en un frame de 640x640) y ejecutar detección
+        # solo sobre la ROI de la cámara si existe
+        camera_id = frame_data.get("camera_id")
+        detections = [
+            {
+                "class": det["class"],
+                "confidence": round(det["confidence"], 3),
+                "bbox": [int(v) for v in det["bbox"]]
+            }
+            for det in await detect_base64(frame_base64, camera_id, target_size=(640, 640))
+        ]
+
+        detected = len(detections) > 0
+        max_conf = max((det["confidence"] for det in detections), default=0.0)
 
         # Enviar alerta si es necesario
         alert_sent = False
@@ -265,6 +477,17 @@ async def detect_weapon_in_frame(
                 config=alert_config
             )
 
+        # Difundir a los dashboards suscritos
+        if detected:
+            await event_hub.publish({
+                "type": "detection",
+                "camera_id": camera_id,
+                "detections": detections,
+                "timestamp": datetime.now().isoformat(),
+                "alert_sent": alert_sent,
+                "clip_path": None
+            })
+
         return {
             "detected": detected,
             "detections": detections,
@@ -286,64 +509,122 @@ async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket para streaming de video en tiempo real
     Más eficiente que HTTP para video continuo
+
+    Además de los resultados, envía mensajes {"type": "control", ...}
+    con el fps, resolución y calidad JPEG que debe usar el cliente.
+    El cliente puede incluir "sent_at" (epoch ms) en cada frame para
+    que el servidor mida el retraso de la cola.
+
+    Los últimos frames de cada stream se guardan en memoria para
+    poder grabar evidencia (pre/post-roll) cuando hay una detección.
     """
     await websocket.accept()
     active_connections.append(websocket)
 
     logger.info("🔌 Nueva conexión WebSocket establecida")
 
+    rate_controller = StreamRateController(
+        min_fps=STREAM_MIN_FPS,
+        max_fps=STREAM_MAX_FPS,
+        boost_seconds=STREAM_BOOST_SECONDS
+    )
+
+    # Streams de esta conexión (cámara o la propia conexión) y último clip
+    connection_stream = f"conn-{id(websocket)}"
+    streams = set()
+    last_clip_path = None
+
     try:
+        # Parámetros iniciales de captura
+        await websocket.send_json(rate_controller.initial_message())
+
         while True:
             # Recibir frame
             data = await websocket.receive_json()
+            received_at_ms = time.time() * 1000
+            start = time.perf_counter()
 
             frame_base64 = data.get("frame")
             alert_config_data = data.get("alert_config", {})
+            camera_id = data.get("camera_id")
 
             if not frame_base64:
                 continue
 
-            # Decodificar y procesar
-            img_bytes = base64.b64decode(frame_base64)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            # Detección
-            results = model(img, conf=CONFIDENCE_THRESHOLD, verbose=False)
-
-            detected = False
-            detections = []
-
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    conf = float(box.conf[0])
-                    cls = int(box.cls[0])
-                    class_name = model.names[cls]
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                    detections.append({
-                        "class": class_name,
-                        "confidence": round(conf, 3),
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)]
-                    })
-                    detected = True
+            # Guardar el frame codificado para la evidencia (buffer propio de esta
+            # conexión: otra conexión con el mismo camera_id no lo comparte)
+            stream_id = f"{camera_id}-{connection_stream}" if camera_id else connection_stream
+            streams.add(stream_id)
+            evidence_recorder.add_frame(stream_id, frame_base64)
+
+            # Decodificar y detectar (solo sobre la ROI de la cámara si existe)
+            detections = [
+                {
+                    "class": det["class"],
+                    "confidence": round(det["confidence"], 3),
+                    "bbox": [int(v) for v in det["bbox"]]
+                }
+                for det in await detect_base64(frame_base64, camera_id)
+            ]
+            detected = len(detections) > 0
+            # Solo decodificación + inferencia: el envío depende de la red del cliente
+            inference_ms = (time.perf_counter() - start) * 1000
 
             # Enviar respuesta
+            timestamp = datetime.now().isoformat()
             await websocket.send_json({
                 "detected": detected,
                 "detections": detections,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             })
 
+            # Evidencia: el clip se escribe en segundo plano al completar el post-roll
+            clip_path = evidence_recorder.trigger(stream_id, detections, timestamp) if detected else None
+
+            # Ajustar la tasa del cliente según la carga
+            control = rate_controller.record_frame(
+                inference_ms=inference_ms,
+                sent_at_ms=data.get("sent_at"),
+                received_at_ms=received_at_ms,
+                detected=detected,
+                active_streams=len(active_connections),
+                capacity=MODEL_REPLICAS
+            )
+            if control:
+                await websocket.send_json(control)
+
             # Enviar alerta si se detectó arma
+            alert_sent = False
             if detected and alert_config_data:
                 config = AlertConfig(**alert_config_data)
-                await alert_manager.send_alert(
+                alert_sent = await alert_manager.send_alert(
                     detection_type=detections[0]["class"],
                     confidence=detections[0]["confidence"],
                     timestamp=datetime.now().isoformat(),
-                    config=config
+                    config=config,
+                    evidence_path=clip_path
+                )
+
+            # Difundir a los dashboards suscritos (mismo formato que /detect/frame)
+            if detected:
+                await event_hub.publish({
+                    "type": "detection",
+                    "camera_id": camera_id,
+                    "detections": detections,
+                    "timestamp": timestamp,
+                    "alert_sent": alert_sent,
+                    "clip_path": clip_path
+                })
+
+            # Registrar la detección una vez por clip de evidencia
+            if detected and clip_path != last_clip_path:
+                last_clip_path = clip_path
+                detection_logger.log_detection(
+                    class_name=detections[0]["class"],
+                    confidence=detections[0]["confidence"],
+                    timestamp=timestamp,
+                    alert_sent=alert_sent,
+                    metadata={"camera_id": camera_id, "clip_path": clip_path}
                 )
 
     except WebSocketDisconnect:
@@ -352,6 +633,62 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"Error en WebSocket: {e}")
         active_connections.remove(websocket)
+    finally:
+        # Guardar lo que haya de post-roll y liberar los buffers
+        for stream_id in streams:
+            evidence_recorder.flush(stream_id)
+
+
+@app.websocket("/ws/events")
+async def events_endpoint(
+    websocket: WebSocket,
+    classes: str = Query(None),
+    camera_id: str = Query(None)
+):
+    """
+    WebSocket de suscripción a detecciones en vivo (dashboards)
+
+    Filtros opcionales separados por coma:
+        /ws/events?classes=pistol,knife&camera_id=cam1,cam2
+    """
+    await websocket.accept()
+    dashboard_connections.append(websocket)
+
+    subscriber = event_hub.subscribe(
+        classes={c.strip() for c in classes.split(",") if c.strip()} if classes else None,
+        cameras={c.strip() for c in camera_id.split(",") if c.strip()} if camera_id else None
+    )
+
+    async def forward_events():
+        try:
+            while True:
+                payload = await subscriber.queue.get()
+                await websocket.send_text(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Sin envío el dashboard no recibe nada: se cierra para que el bucle de recepción termine
+            logger.error(f"Error enviando eventos al dashboard: {e}")
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    sender = asyncio.create_task(forward_events())
+
+    try:
+        # Solo se escucha para detectar la desconexión
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        logger.info("📡 Dashboard desconectado")
+    except Exception as e:
+        logger.error(f"Error en WebSocket de eventos: {e}")
+    finally:
+        sender.cancel()
+        event_hub.unsubscribe(subscriber)
+        if websocket in dashboard_connections:
+            dashboard_connections.remove(websocket)
 
 
 # ============================================
@@ -365,6 +702,41 @@ async def configure_alerts(config: AlertConfig):
     return {"status": "success", "message": "Configuración de alertas actualizada"}
 
 
+@app.get("/config/roi")
+async def list_roi():
+    """Lista las regiones de interés de todas las cámaras"""
+    return roi_manager.get_all()
+
+
+@app.get("/config/roi/{camera_id}")
+async def get_roi(camera_id: str):
+    """Obtiene las regiones de interés de una cámara"""
+    return {"camera_id": camera_id, "polygons": roi_manager.get_regions(camera_id)}
+
+
+@app.post("/config/roi/{camera_id}")
+async def configure_roi(camera_id: str, config: ROIConfig):
+    """
+    Configura las regiones de interés de una cámara
+
+    Solo se ejecuta el modelo sobre los recortes de estas regiones
+    y se descartan las detecciones fuera de ellas.
+    """
+    try:
+        roi_manager.set_regions(camera_id, config.polygons)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "message": f"ROI actualizada para cámara {camera_id}"}
+
+
+@app.delete("/config/roi/{camera_id}")
+async def delete_roi(camera_id: str):
+    """Elimina las regiones de interés (se vuelve a analizar el frame completo)"""
+    if not roi_manager.clear_regions(camera_id):
+        raise HTTPException(status_code=404, detail="La cámara no tiene ROI configurada")
+    return {"status": "success", "message": f"ROI eliminada para cámara {camera_id}"}
+
+
 @app.get("/stats/detections")
 async def get_detection_stats():
     """Obtiene estadísticas de detecciones"""
@@ -372,6 +744,42 @@ async def get_detection_stats():
     return stats
 
 
+@app.get("/stats/events")
+async def get_event_stats():
+    """Obtiene estadísticas del hub de eventos"""
+    return event_hub.get_stats()
+
+
+@app.get("/stats/models")
+async def get_model_pool_stats():
+    """Obtiene la carga de cada réplica del modelo"""
+    if not isinstance(model, ModelReplicaPool):
+        return {"replicas": 1 if model is not None else 0}
+    return model.get_stats()
+
+
+@app.get("/stats/decode")
+async def get_decode_stats():
+    """Obtiene el estado del pool de decodificación"""
+    if decode_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **decode_pool.get_stats()}
+
+
+@app.get("/stats/evidence")
+async def get_evidence_stats():
+    """Obtiene el uso de memoria del buffer de evidencia"""
+    return evidence_recorder.get_stats()
+
+
+@app.get("/stats/cascade")
+async def get_cascade_stats():
+    """Obtiene métricas de escalado por etapa de la cascada"""
+    if cascade is None:
+        return {"enabled": False}
+    return {"enabled": True, **cascade.get_stats()}
+
+
 # ============================================
 # STARTUP Y SHUTDOWN
 # ============================================
@@ -382,12 +790,24 @@ async def startup_event():
     logger.info("🚀 Iniciando servidor de detección de armas...")
     logger.info(f"📊 Modelo: {MODEL_PATH}")
     logger.info(f"🎯 Confianza mínima: {CONFIDENCE_THRESHOLD}")
+    if cascade is not None:
+        logger.info(f"🪜 Screener: {SCREENER_MODEL_PATH} | Confirmer: {CONFIRMER_MODEL_PATH}")
+    await event_hub.start()
+    if decode_pool is not None:
+        await decode_pool.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Limpieza al cerrar el servidor"""
     logger.info("🛑 Cerrando servidor...")
-    # Cerrar conexiones activas
-    for connection in active_connections:
+    await event_hub.stop()
+    if decode_pool is not None:
+        await decode_pool.stop()
+    for pooled in _loaded_models.values():
+        if isinstance(pooled, ModelReplicaPool):
+            pooled.shutdown()
+    # Cerrar conexiones activas antes que el grabador: sus flush guardan el post-roll
+    for connection in active_connections + dashboard_connections:
         await connection.close()
+    evidence_recorder.shutdown()
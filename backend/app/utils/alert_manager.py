@@ -105,7 +105,8 @@ class AlertManager:
         detection_type: str,
         confidence: float,
         timestamp: str,
-        config
+        config,
+        evidence_path: Optional[str] = None
     ) -> bool:
         """
         Envía alertas según la configuración
@@ -115,6 +116,7 @@ class AlertManager:
             confidence: Nivel de confianza (0-1)
             timestamp: Timestamp de la detección
             config: AlertConfig con configuración de notificaciones
+            evidence_path: Ruta del clip de evidencia (opcional)
 
         Returns:
             True si se envió al menos una alerta
@@ -126,7 +128,7 @@ class AlertManager:
         alert_sent = False
 
         # Mensaje de alerta
-        message = self._generate_alert_message(detection_type, confidence, timestamp)
+        message = self._generate_alert_message(detection_type, confidence, timestamp, evidence_path)
 
         # Enviar SMS
         if config.enable_sms and config.phone_number:
@@ -145,14 +147,22 @@ class AlertManager:
 
         return alert_sent
 
-    def _generate_alert_message(self, detection_type: str, confidence: float, timestamp: str) -> str:
+    def _generate_alert_message(
+        self,
+        detection_type: str,
+        confidence: float,
+        timestamp: str,
+        evidence_path: Optional[str] = None
+    ) -> str:
         """Genera mensaje de alerta"""
         confidence_percent = confidence * 100
+        evidence = f"Evidencia: {evidence_path}\n" if evidence_path else ""
         return (
             f"🚨 ALERTA DE SEGURIDAD 🚨\n\n"
             f"Se ha detectado: {detection_type.upper()}\n"
             f"Confianza: {confidence_percent:.1f}%\n"
-            f"Hora: {timestamp}\n\n"
+            f"Hora: {timestamp}\n"
+            f"{evidence}\n"
             f"Revise las cámaras de seguridad inmediatamente."
         )
 
@@ -0,0 +1,496 @@
+"""
+Pool de Decodificación - Weapon Detection
+Procesos que decodifican JPEG/base64 y hacen letterbox directamente
+sobre un ring buffer de memoria compartida (sin pickling del tensor)
+"""
+
+import asyncio
+import base64
+import itertools
+import logging
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import connection, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SLOT_SIZE = 640
+SLOT_SHAPE = (SLOT_SIZE, SLOT_SIZE, 3)
+PAD_COLOR = 114  # mismo gris que usa YOLO en su letterbox
+
+
+class DecodeError(Exception):
+    """Error al decodificar un frame (imagen inválida)"""
+    pass
+
+
+class WorkerUnavailable(Exception):
+    """El worker que tenía la tarea murió o dejó de avanzar"""
+    pass
+
+
+def letterbox_into(img: np.ndarray, out: np.ndarray) -> Tuple[float, int, int]:
+    """
+    Redimensiona manteniendo proporción y centra la imagen en `out`
+
+    Args:
+        img: Imagen BGR original
+        out: Buffer destino (SLOT_SIZE x SLOT_SIZE x 3)
+
+    Returns:
+        (escala, padding_x, padding_y)
+    """
+    height, width = img.shape[:2]
+    size = out.shape[0]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+
+    out[:] = PAD_COLOR
+    out[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+        img, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+    )
+    return scale, pad_x, pad_y
+
+
+def decode_base64_into(frame_base64: str, out: np.ndarray) -> Tuple[int, int, float, int, int]:
+    """
+    Decodifica un frame base64 y lo escribe con letterbox en `out`
+
+    Returns:
+        (ancho, alto, escala, padding_x, padding_y)
+    """
+    nparr = np.frombuffer(base64.b64decode(frame_base64), np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise DecodeError("No se pudo decodificar la imagen")
+    height, width = img.shape[:2]
+    scale, pad_x, pad_y = letterbox_into(img, out)
+    return width, height, scale, pad_x, pad_y
+
+
+def _decode_worker(shm_name: str, num_slots: int, tasks, results):
+    """
+    Proceso worker: decodifica tareas (task_id, slot, base64) en su slot
+
+    `results` es el extremo de escritura de un pipe propio del worker:
+    si el proceso muere a mitad de un envío solo se pierde su pipe.
+    """
+    # Un hilo por worker: el paralelismo lo dan los procesos
+    cv2.setNumThreads(1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((num_slots, *SLOT_SHAPE), dtype=np.uint8, buffer=shm.buf)
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, frame_base64 = task
+            try:
+                result = (task_id, True, decode_base64_into(frame_base64, slots[slot]))
+            except Exception as e:
+                result = (task_id, False, str(e))
+            results.send(result)
+    except (BrokenPipeError, EOFError):
+        pass  # el proceso principal cerró el pipe (reinicio o apagado)
+    finally:
+        del slots
+        shm.close()
+
+
+class DecodedFrame:
+    """
+    Frame decodificado que vive en un slot de memoria compartida
+
+    `image` es una vista del slot (sin copia). Hay que llamar a
+    release() cuando la inferencia termine para reutilizar el slot.
+    """
+
+    def __init__(self, pool: "SharedDecodePool", slot: int, info: Tuple[int, int, float, int, int]):
+        self.pool = pool
+        self.slot = slot
+        self.width, self.height, self.scale, self.pad_x, self.pad_y = info
+        self.image = pool.slots[slot]
+
+    @property
+    def content_rect(self) -> Tuple[int, int, int, int]:
+        """Zona del slot que ocupa el frame real (x, y, ancho, alto)"""
+        return (
+            self.pad_x,
+            self.pad_y,
+            int(round(self.width * self.scale)),
+            int(round(self.height * self.scale))
+        )
+
+    def to_frame_coords(self, bbox: List[float], target_size: Optional[Tuple[int, int]] = None) -> List[float]:
+        """
+        Convierte una caja del slot a coordenadas del frame original
+
+        Args:
+            bbox: [x1, y1, x2, y2] en el slot
+            target_size: (ancho, alto) si se quiere reescalar a otro tamaño
+
+        Returns:
+            [x1, y1, x2, y2] en el frame original (o en target_size)
+        """
+        x1, y1, x2, y2 = bbox
+        coords = [
+            (x1 - self.pad_x) / self.scale,
+            (y1 - self.pad_y) / self.scale,
+            (x2 - self.pad_x) / self.scale,
+            (y2 - self.pad_y) / self.scale
+        ]
+        coords = [
+            min(max(v, 0.0), float(self.width if i % 2 == 0 else self.height))
+            for i, v in enumerate(coords)
+        ]
+        if target_size:
+            sx, sy = target_size[0] / self.width, target_size[1] / self.height
+            coords = [coords[0] * sx, coords[1] * sy, coords[2] * sx, coords[3] * sy]
+        return coords
+
+    def release(self):
+        """Devuelve el slot al ring buffer"""
+        if self.slot is not None:
+            self.pool.release(self.slot)
+            self.slot = None
+
+
+class SharedDecodePool:
+    """
+    Pool de procesos de decodificación sobre memoria compartida
+
+    El ring buffer tiene `num_slots` slots fijos de 640x640x3 uint8.
+    Si un worker muere o deja de avanzar se reinicia y el frame se
+    decodifica en el propio proceso, así nunca se pierde un frame.
+    Un worker lento pero vivo no se reinicia: se espera su resultado.
+    """
+
+    def __init__(self, workers: int = 2, num_slots: int = 16, stall_timeout: float = 10.0):
+        self.num_workers = workers
+        self.num_slots = num_slots
+        self.stall_timeout = stall_timeout  # segundos sin resultados con tareas pendientes
+        self.ctx = mp.get_context("spawn")
+
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.slots: Optional[np.ndarray] = None
+        self.processes: List = []
+        self.task_queues: List = []
+        self.result_pipes: List = []  # extremo de lectura del pipe de cada worker
+        self._last_progress: List[float] = []
+        self._restarting: set = set()
+
+        self._free_slots: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, Tuple[int, int, asyncio.Future]] = {}  # task_id -> (worker, slot, future)
+        self._orphaned: set = set()  # tareas canceladas cuyo slot sigue reservado hasta que el worker termine
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._running = False
+        self._collector: Optional[threading.Thread] = None
+
+        self.decoded = 0
+        self.fallbacks = 0
+        self.restarts = 0
+
+    async def start(self):
+        """Reserva la memoria compartida y arranca los workers"""
+        self._loop = asyncio.get_running_loop()
+        slot_bytes = int(np.prod(SLOT_SHAPE))
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes * self.num_slots)
+        self.slots = np.ndarray((self.num_slots, *SLOT_SHAPE), dtype=np.uint8, buffer=self.shm.buf)
+
+        self._free_slots = asyncio.Queue()
+        for slot in range(self.num_slots):
+            self._free_slots.put_nowait(slot)
+
+        for index in range(self.num_workers):
+            process, tasks, reader = self._spawn_worker(index)
+            self.processes.append(process)
+            self.task_queues.append(tasks)
+            self.result_pipes.append(reader)
+            self._last_progress.append(time.monotonic())
+
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="decode-collector", daemon=True)
+        self._collector.start()
+
+        logger.info(
+            f"🧵 Pool de decodificación: {self.num_workers} proceso(s), "
+            f"{self.num_slots} slots de {SLOT_SIZE}x{SLOT_SIZE}"
+        )
+
+    def _spawn_worker(self, index: int):
+        """Lanza el proceso worker `index` con su cola de tareas y su pipe de resultados"""
+        tasks = self.ctx.Queue()
+        reader, writer = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=_decode_worker,
+            args=(self.shm.name, self.num_slots, tasks, writer),
+            name=f"decode-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        writer.close()  # solo el worker escribe: así el lector ve EOF si muere
+        return process, tasks, reader
+
+    def _schedule_restart(self, index: int, reason: str, process):
+        """Reinicia el worker en un hilo aparte para no frenar la recolección"""
+        with self._lock:
+            if self.processes[index] is not process or index in self._restarting:
+                return  # ya reemplazado o reiniciándose
+            self._restarting.add(index)
+        threading.Thread(
+            target=self._restart_worker,
+            args=(index, reason, process),
+            name=f"decode-restart-{index}",
+            daemon=True
+        ).start()
+
+    def _restart_worker(self, index: int, reason: str, process):
+        """
+        Mata el worker, lanza uno nuevo y falla sus tareas pendientes
+
+        terminate/join/spawn se hacen fuera del lock (pueden tardar
+        segundos); bajo el lock solo se intercambian los handles.
+        """
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=1)
+
+        # El proceso viejo ya no existe: sus slots se pueden reutilizar y sus
+        # tareas se decodifican localmente sin esperar al nuevo worker
+        with self._lock:
+            failed = [tid for tid, (worker, _, _) in self._pending.items() if worker == index]
+            tasks = [(task_id, self._pending.pop(task_id)) for task_id in failed]
+        for task_id, (_, slot, future) in tasks:
+            self._resolve(task_id, slot, future, self._set_exception, WorkerUnavailable(reason))
+
+        if not self._running:
+            return  # el pool se está deteniendo
+
+        new_process, new_tasks, new_reader = self._spawn_worker(index)
+
+        with self._lock:
+            old_tasks, old_reader = self.task_queues[index], self.result_pipes[index]
+            self.processes[index] = new_process
+            self.task_queues[index] = new_tasks
+            self.result_pipes[index] = new_reader
+            self._last_progress[index] = time.monotonic()
+            self._restarting.discard(index)
+            self.restarts += 1
+
+        # La cola y el pipe viejos pueden haber quedado a medio escribir: se descartan
+        old_reader.close()
+        old_tasks.cancel_join_thread()
+        old_tasks.close()
+
+        logger.warning(f"⚠️ Worker de decodificación {index} reiniciado: {reason}")
+
+    def _resolve(self, task_id: int, slot: int, future: asyncio.Future, setter, value):
+        """
+        Entrega el resultado de una tarea al event loop
+
+        Si quien esperaba la tarea fue cancelado, el slot quedó reservado
+        (el worker todavía escribía en él): se libera recién ahora.
+        """
+        with self._lock:
+            orphaned = task_id in self._orphaned
+            self._orphaned.discard(task_id)
+        if orphaned:
+            self._loop.call_soon_threadsafe(self.release, slot)
+        else:
+            self._loop.call_soon_threadsafe(setter, future, value)
+
+    @staticmethod
+    def _set_result(future: asyncio.Future, value):
+        if not future.done():
+            future.set_result(value)
+
+    @staticmethod
+    def _set_exception(future: asyncio.Future, exc: Exception):
+        if not future.done():
+            future.set_exception(exc)
+
+    def _collect(self):
+        """Hilo que recoge resultados y vigila que los workers sigan avanzando"""
+        last_check = time.monotonic()
+        closed = set()  # lectores con EOF, a la espera de que se reinicie su worker
+        while self._running:
+            with self._lock:
+                readers = {reader: index for index, reader in enumerate(self.result_pipes)}
+            try:
+                ready = connection.wait([r for r in readers if r not in closed], timeout=0.5)
+            except OSError:
+                ready = []  # un reinicio cerró un lector mientras se esperaba
+
+            for reader in ready:
+                try:
+                    task_id, ok, payload = reader.recv()
+                except (EOFError, OSError):
+                    closed.add(reader)
+                    continue
+                except Exception as e:
+                    logger.error(f"❌ Error recogiendo resultados de decodificación: {e}")
+                    closed.add(reader)
+                    continue
+
+                with self._lock:
+                    self._last_progress[readers[reader]] = time.monotonic()
+                    pending = self._pending.pop(task_id, None)
+                if pending is not None:
+                    _, slot, future = pending
+                    if ok:
+                        self._resolve(task_id, slot, future, self._set_result, payload)
+                    else:
+                        self._resolve(task_id, slot, future, self._set_exception, DecodeError(payload))
+
+            closed &= set(self.result_pipes)
+
+            if time.monotonic() - last_check >= 0.5:
+                last_check = time.monotonic()
+                self._check_workers()
+
+    def _check_workers(self):
+        """Reinicia los workers muertos o que no avanzan con tareas pendientes"""
+        now = time.monotonic()
+        with self._lock:
+            busy = {worker for worker, _, _ in self._pending.values()}
+            workers = list(enumerate(self.processes))
+            progress = list(self._last_progress)
+
+        for index, process in workers:
+            if not self._running:
+                return
+            if not process.is_alive():
+                self._schedule_restart(index, f"proceso terminado (exit code {process.exitcode})", process)
+            elif index in busy and now - progress[index] > self.stall_timeout:
+                self._schedule_restart(index, f"sin progreso en {self.stall_timeout:.0f}s", process)
+
+    def _pick_worker(self) -> Optional[int]:
+        """Worker con menos tareas pendientes (None si todos se están reiniciando)"""
+        load = {index: 0 for index in range(self.num_workers) if index not in self._restarting}
+        for worker, _, _ in self._pending.values():
+            if worker in load:
+                load[worker] += 1
+        if not load:
+            return None
+        return min(load, key=load.get)
+
+    async def decode(self, frame_base64: str) -> DecodedFrame:
+        """
+        Decodifica un frame base64 en un slot libre del ring buffer
+
+        Espera si no hay slots libres (contrapresión). Si el worker
+        muere o deja de avanzar, decodifica en este proceso.
+
+        Raises:
+            DecodeError: Si la imagen no es válida
+            WorkerUnavailable: Si el pool se detuvo
+        """
+        if not self._running:
+            raise WorkerUnavailable("pool de decodificación detenido")
+
+        slot = await self._free_slots.get()
+        future = self._loop.create_future()
+
+        with self._lock:
+            task_id = next(self._task_ids)
+            worker = self._pick_worker()
+            if worker is not None:
+                if not any(w == worker for w, _, _ in self._pending.values()):
+                    self._last_progress[worker] = time.monotonic()  # el reloj de bloqueo arranca aquí
+                self._pending[task_id] = (worker, slot, future)
+                self.task_queues[worker].put((task_id, slot, frame_base64))
+
+        if worker is None:
+            info = self._decode_locally(frame_base64, slot)
+            self.decoded += 1
+            return DecodedFrame(self, slot, info)
+
+        try:
+            # Sin timeout fijo: un worker ocupado pero vivo termina su trabajo; si
+            # muere o se bloquea, el reinicio falla el future con WorkerUnavailable
+            info = await future
+        except WorkerUnavailable:
+            if not self._running:
+                self.release(slot)
+                raise
+            info = self._decode_locally(frame_base64, slot)
+        except BaseException:
+            # Cancelado con la tarea aún en el worker: el slot se libera cuando
+            # llegue su resultado (o falle), no ahora
+            with self._lock:
+                in_flight = task_id in self._pending
+                if in_flight:
+                    self._orphaned.add(task_id)
+            if not in_flight:
+                self.release(slot)
+            raise
+
+        self.decoded += 1
+        return DecodedFrame(self, slot, info)
+
+    def _decode_locally(self, frame_base64: str, slot: int):
+        """Decodificación de respaldo en el proceso principal"""
+        self.fallbacks += 1
+        try:
+            return decode_base64_into(frame_base64, self.slots[slot])
+        except BaseException:
+            self.release(slot)
+            raise
+
+    def release(self, slot: int):
+        """Devuelve un slot al ring buffer"""
+        self._free_slots.put_nowait(slot)
+
+    async def stop(self):
+        """Detiene los workers y libera la memoria compartida"""
+        self._running = False
+
+        # Quien espera una decodificación no debe quedar colgado durante el cierre
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._orphaned.clear()
+        for _, _, future in pending:
+            self._set_exception(future, WorkerUnavailable("pool de decodificación detenido"))
+
+        for tasks in self.task_queues:
+            tasks.put(None)
+        for process in self.processes:
+            await self._loop.run_in_executor(None, process.join, 2)
+            if process.is_alive():
+                process.terminate()
+        if self._collector:
+            self._collector.join(timeout=1)
+        for reader in self.result_pipes:
+            reader.close()
+
+        self.slots = None
+        if self.shm:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del pool"""
+        return {
+            "workers": self.num_workers,
+            "workers_alive": sum(1 for p in self.processes if p and p.is_alive()),
+            "workers_restarting": len(self._restarting),
+            "slots": self.num_slots,
+            "free_slots": self._free_slots.qsize() if self._free_slots else 0,
+            "frames_decoded": self.decoded,
+            "local_fallbacks": self.fallbacks,
+            "worker_restarts": self.restarts
+        }
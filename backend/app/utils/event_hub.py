@@ -0,0 +1,199 @@
+"""
+Hub de Eventos - Weapon Detection
+Difunde las detecciones a los dashboards suscritos (pub/sub)
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+# Importación condicional de Redis (solo para varios workers)
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    Suscriptor con cola acotada y filtros opcionales
+
+    Si el consumidor es lento y la cola se llena, se descarta
+    el evento más antiguo para que siempre reciba lo más reciente.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 100,
+        classes: Optional[Set[str]] = None,
+        cameras: Optional[Set[str]] = None
+    ):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.classes = classes
+        self.cameras = cameras
+        self.dropped = 0
+
+    def matches(self, classes: Set[str], camera_id: Optional[str]) -> bool:
+        """Indica si el evento pasa los filtros del suscriptor"""
+        if self.cameras and camera_id not in self.cameras:
+            return False
+        if self.classes and not (self.classes & classes):
+            return False
+        return True
+
+    def offer(self, payload: str):
+        """Encola el evento sin bloquear (descarta el más antiguo si está llena)"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(payload)
+
+
+class EventHub:
+    """
+    Pub/sub en memoria para eventos de detección
+
+    Cada evento se serializa una sola vez y la misma cadena se
+    comparte con todos los suscriptores. Con Redis configurado, los
+    eventos se publican en un canal y cada worker los reparte a sus
+    propios suscriptores.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 100,
+        redis_url: Optional[str] = None,
+        channel: str = "detections",
+        reconnect_delay: float = 1.0
+    ):
+        self.max_queue = max_queue
+        self.redis_url = redis_url
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay  # espera inicial entre reintentos (se duplica hasta 30s)
+        self.subscribers: List[Subscriber] = []
+        self.published = 0
+        self._redis = None
+        self._listening = False  # True mientras la suscripción a Redis está activa
+        self._listener_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Conecta a Redis si está configurado"""
+        if not self.redis_url:
+            return
+
+        if not REDIS_AVAILABLE:
+            logger.warning("⚠️ redis no instalado, el hub de eventos funciona solo en memoria")
+            return
+
+        self._redis = aioredis.from_url(self.redis_url)
+        self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Cierra la conexión a Redis"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            self._listener_task = None
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+        self._listening = False
+
+    async def _listen(self):
+        """
+        Reparte localmente los eventos recibidos desde Redis
+
+        Si la conexión se cae, vuelve a suscribirse con backoff. Mientras
+        tanto publish() entrega los eventos de este worker en memoria.
+        """
+        delay = self.reconnect_delay
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._listening = True
+                delay = self.reconnect_delay
+                logger.info(f"✅ Hub de eventos suscrito a Redis ({self.channel})")
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = message["data"]
+                    if isinstance(payload, bytes):
+                        payload = payload.decode("utf-8")
+                    self._dispatch(payload, json.loads(payload))
+
+            except asyncio.CancelledError:
+                self._listening = False
+                await pubsub.close()
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error escuchando eventos de Redis, reintento en {delay:.0f}s: {e}")
+
+            self._listening = False
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def subscribe(self, classes: Optional[Set[str]] = None, cameras: Optional[Set[str]] = None) -> Subscriber:
+        """Registra un nuevo suscriptor"""
+        subscriber = Subscriber(self.max_queue, classes or None, cameras or None)
+        self.subscribers.append(subscriber)
+        logger.info(f"📡 Nuevo suscriptor de eventos ({len(self.subscribers)} activos)")
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Elimina un suscriptor"""
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            logger.info(f"📡 Suscriptor eliminado ({len(self.subscribers)} activos)")
+
+    async def publish(self, event: Dict):
+        """
+        Publica un evento de detección
+
+        Args:
+            event: Diccionario con "camera_id", "detections", "timestamp", etc.
+        """
+        payload = json.dumps(event)
+        self.published += 1
+
+        published = False
+        if self._redis:
+            try:
+                await self._redis.publish(self.channel, payload)
+                published = True
+            except Exception as e:
+                logger.error(f"❌ Error publicando en Redis, se reparte localmente: {e}")
+
+        # Sin suscripción activa a Redis los dashboards de este worker
+        # no recibirían el evento por el canal: se entrega en memoria
+        if not (published and self._listening):
+            self._dispatch(payload, event)
+
+    def _dispatch(self, payload: str, event: Dict):
+        """Entrega la misma cadena serializada a cada suscriptor que la acepte"""
+        classes = {det["class"] for det in event.get("detections", [])}
+        camera_id = event.get("camera_id")
+        for subscriber in self.subscribers:
+            if subscriber.matches(classes, camera_id):
+                subscriber.offer(payload)
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del hub"""
+        return {
+            "subscribers": len(self.subscribers),
+            "events_published": self.published,
+            "events_dropped": sum(s.dropped for s in self.subscribers),
+            "redis_enabled": self._redis is not None,
+            "redis_listening": self._listening
+        }
@@ -0,0 +1,266 @@
+"""
+Grabador de Evidencia - Weapon Detection
+Mantiene un ring buffer de los últimos frames por stream y, ante una
+detección, guarda pre-roll, post-roll y un snapshot anotado en disco
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PendingClip:
+    """Clip disparado que todavía está juntando frames de post-roll"""
+
+    def __init__(self, path: str, pre_roll: List[Tuple[str, str]], detections: List[Dict], timestamp: str):
+        self.path = path
+        self.pre_roll = pre_roll
+        self.post_roll: List[Tuple[str, str]] = []
+        self.detections = detections
+        self.snapshot_detections = list(detections)
+        self.timestamp = timestamp
+        self.bytes = sum(len(frame) for _, frame in pre_roll)
+
+
+class EvidenceRecorder:
+    """
+    Ring buffer de frames codificados por stream con límite de memoria
+
+    Los frames se guardan tal como llegan (JPEG en base64), sin
+    decodificar. Mientras un clip junta post-roll, el ring buffer se
+    traslada al clip, así que pre-roll + post-roll comparten el mismo
+    límite por stream. La escritura a disco se hace en un hilo aparte
+    con una cola acotada para no frenar la inferencia.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "evidence",
+        pre_roll_frames: int = 30,
+        post_roll_frames: int = 30,
+        max_bytes_per_stream: int = 16 * 1024 * 1024,
+        max_queued_clips: int = 8
+    ):
+        self.output_dir = output_dir
+        self.pre_roll_frames = pre_roll_frames
+        self.post_roll_frames = post_roll_frames
+        self.max_bytes_per_stream = max_bytes_per_stream
+        self.max_queued_clips = max_queued_clips  # clips esperando al hilo de escritura
+
+        self._buffers: Dict[str, Deque[Tuple[str, str]]] = {}
+        self._buffer_bytes: Dict[str, int] = {}
+        self._pending: Dict[str, PendingClip] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evidence-writer")
+        self._queue_lock = threading.Lock()
+        self._queued_clips = 0
+        self._queued_bytes = 0
+        self._dropped_clips = 0
+        self._closed = False
+
+        os.makedirs(output_dir, exist_ok=True)
+        logger.info(f"🎞️ Grabador de evidencia inicializado: {output_dir}")
+
+    def add_frame(self, stream_id: str, frame_base64: str, timestamp: Optional[str] = None):
+        """
+        Agrega un frame al ring buffer del stream
+
+        Args:
+            stream_id: Identificador del stream (uno por conexión)
+            frame_base64: Frame JPEG en base64 tal como lo envió el cliente
+            timestamp: Timestamp ISO del frame
+        """
+        if self._closed:
+            return
+
+        frame = (timestamp or datetime.now().isoformat(), frame_base64)
+
+        # Completar el post-roll de un clip pendiente
+        clip = self._pending.get(stream_id)
+        if clip is not None:
+            clip.post_roll.append(frame)
+            clip.bytes += len(frame_base64)
+            if len(clip.post_roll) >= self.post_roll_frames:
+                self._finalize(stream_id)
+            else:
+                self._enforce_clip_limit(stream_id, clip)
+            return
+
+        buffer = self._buffers.setdefault(stream_id, deque())
+        buffer.append(frame)
+        self._buffer_bytes[stream_id] = self._buffer_bytes.get(stream_id, 0) + len(frame_base64)
+        self._trim(stream_id)
+
+    def _trim(self, stream_id: str):
+        """Respeta el máximo de frames y de memoria del ring buffer"""
+        buffer = self._buffers[stream_id]
+        while buffer and (
+            len(buffer) > self.pre_roll_frames
+            or self._buffer_bytes[stream_id] > self.max_bytes_per_stream
+        ):
+            _, oldest = buffer.popleft()
+            self._buffer_bytes[stream_id] -= len(oldest)
+
+    def _enforce_clip_limit(self, stream_id: str, clip: PendingClip):
+        """
+        Mantiene el clip pendiente dentro del límite del stream
+
+        Primero descarta el pre-roll más antiguo (conserva el frame del
+        snapshot); si el post-roll solo ya supera el límite, el clip se
+        cierra antes de tiempo.
+        """
+        while clip.bytes > self.max_bytes_per_stream and len(clip.pre_roll) > 1:
+            _, oldest = clip.pre_roll.pop(0)
+            clip.bytes -= len(oldest)
+
+        if clip.bytes > self.max_bytes_per_stream:
+            logger.warning(f"⚠️ Clip cerrado antes de tiempo por límite de memoria: {clip.path}")
+            self._finalize(stream_id)
+
+    def trigger(self, stream_id: str, detections: List[Dict], timestamp: str) -> str:
+        """
+        Dispara un clip de evidencia con el contenido actual del buffer
+
+        Si ya hay un clip juntando post-roll en este stream, la
+        detección se agrega a ese clip en lugar de abrir otro.
+
+        Args:
+            stream_id: Identificador del stream
+            detections: Detecciones del último frame agregado
+            timestamp: Timestamp ISO de la detección
+
+        Returns:
+            Ruta del directorio donde se guardará el clip
+        """
+        clip = self._pending.get(stream_id)
+        if clip is not None:
+            clip.detections.extend(detections)
+            return clip.path
+
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", stream_id)
+        name = f"{safe_id}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        path = os.path.join(self.output_dir, name)
+
+        # Los frames del ring pasan al clip (no se duplican en memoria);
+        # snapshot = último frame del pre-roll (el que disparó la detección)
+        pre_roll = list(self._buffers.pop(stream_id, ()))
+        self._buffer_bytes.pop(stream_id, None)
+        self._pending[stream_id] = PendingClip(path, pre_roll, list(detections), timestamp)
+
+        if self.post_roll_frames <= 0:
+            self._finalize(stream_id)
+
+        return path
+
+    def flush(self, stream_id: str):
+        """Guarda el clip pendiente (si lo hay) y libera el buffer del stream"""
+        if stream_id in self._pending:
+            self._finalize(stream_id)
+        self._buffers.pop(stream_id, None)
+        self._buffer_bytes.pop(stream_id, None)
+
+    def _finalize(self, stream_id: str, force: bool = False):
+        """
+        Envía el clip al hilo de escritura (no hace nada tras shutdown)
+
+        Los últimos frames del clip vuelven al ring buffer para servir
+        de pre-roll a la próxima detección. Si la cola de escritura está
+        llena el clip se descarta (salvo `force`, usado al apagar).
+        """
+        clip = self._pending.pop(stream_id)
+
+        buffer = deque((clip.pre_roll + clip.post_roll)[-self.pre_roll_frames:] if self.pre_roll_frames > 0 else ())
+        self._buffers[stream_id] = buffer
+        self._buffer_bytes[stream_id] = sum(len(frame) for _, frame in buffer)
+        self._trim(stream_id)
+
+        if self._closed:
+            logger.warning(f"⚠️ Clip descartado tras el cierre del grabador: {clip.path}")
+            return
+
+        with self._queue_lock:
+            if self._queued_clips >= self.max_queued_clips and not force:
+                self._dropped_clips += 1
+                logger.warning(f"⚠️ Cola de escritura llena, clip descartado: {clip.path}")
+                return
+            self._queued_clips += 1
+            self._queued_bytes += clip.bytes
+
+        self._writer.submit(self._write_clip, clip)
+
+    def _write_clip(self, clip: PendingClip):
+        """Escribe frames, snapshot anotado y metadatos (hilo de escritura)"""
+        try:
+            os.makedirs(clip.path, exist_ok=True)
+
+            for prefix, frames in (("pre", clip.pre_roll), ("post", clip.post_roll)):
+                for index, (_, frame_base64) in enumerate(frames):
+                    with open(os.path.join(clip.path, f"{prefix}_{index:03d}.jpg"), "wb") as f:
+                        f.write(base64.b64decode(frame_base64))
+
+            if clip.pre_roll:
+                nparr = np.frombuffer(base64.b64decode(clip.pre_roll[-1][1]), np.uint8)
+                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                if img is not None:
+                    cv2.imwrite(os.path.join(clip.path, "snapshot.jpg"), self._annotate(img, clip.snapshot_detections))
+
+            with open(os.path.join(clip.path, "metadata.json"), "w") as f:
+                json.dump({
+                    "timestamp": clip.timestamp,
+                    "detections": clip.detections,
+                    "pre_roll_frames": len(clip.pre_roll),
+                    "post_roll_frames": len(clip.post_roll),
+                    "frame_timestamps": [ts for ts, _ in clip.pre_roll + clip.post_roll]
+                }, f, indent=2)
+
+            logger.info(f"🎞️ Evidencia guardada: {clip.path}")
+
+        except Exception as e:
+            logger.error(f"❌ Error guardando evidencia: {e}")
+
+        finally:
+            with self._queue_lock:
+                self._queued_clips -= 1
+                self._queued_bytes -= clip.bytes
+
+    def _annotate(self, img: np.ndarray, detections: List[Dict]) -> np.ndarray:
+        """Dibuja las cajas de detección sobre el snapshot"""
+        for det in detections:
+            x1, y1, x2, y2 = [int(v) for v in det["bbox"]]
+            label = f"{det['class']} {det['confidence']:.2f}"
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(img, label, (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        return img
+
+    def get_stats(self) -> Dict:
+        """Uso de memoria, clips pendientes y cola de escritura"""
+        with self._queue_lock:
+            queued_clips, queued_bytes, dropped_clips = self._queued_clips, self._queued_bytes, self._dropped_clips
+        return {
+            "streams": len(self._buffers.keys() | self._pending.keys()),
+            "buffered_frames": sum(len(b) for b in self._buffers.values()),
+            "buffered_bytes": sum(self._buffer_bytes.values()),
+            "pending_clips": len(self._pending),
+            "pending_bytes": sum(clip.bytes for clip in self._pending.values()),
+            "queued_clips": queued_clips,
+            "queued_bytes": queued_bytes,
+            "dropped_clips": dropped_clips
+        }
+
+    def shutdown(self):
+        """Guarda los clips pendientes y espera a que terminen las escrituras"""
+        for stream_id in list(self._pending):
+            self._finalize(stream_id, force=True)
+        self._closed = True
+        self._writer.shutdown(wait=True)
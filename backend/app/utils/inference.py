@@ -0,0 +1,36 @@
+"""
+Utilidades de Inferencia - Weapon Detection
+Conversión de resultados de YOLO a detecciones serializables
+"""
+
+from typing import Dict, List
+
+
+def parse_result(result, names: Dict[int, str]) -> List[Dict]:
+    """
+    Convierte el resultado de YOLO de una imagen en una lista de detecciones
+
+    Args:
+        result: Resultado de ultralytics para una imagen
+        names: Mapeo índice -> nombre de clase del modelo
+
+    Returns:
+        Lista de {"class", "confidence", "bbox": [x1, y1, x2, y2]}
+    """
+    detections = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        detections.append({
+            "class": names[int(box.cls[0])],
+            "confidence": float(box.conf[0]),
+            "bbox": [x1, y1, x2, y2]
+        })
+    return detections
+
+
+def offset_detections(detections: List[Dict], offset_x: int, offset_y: int) -> List[Dict]:
+    """Desplaza las cajas de un recorte a coordenadas del frame completo"""
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        det["bbox"] = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
+    return detections
@@ -0,0 +1,134 @@
+"""
+Cascada de Modelos - Weapon Detection
+Un modelo pequeño a baja resolución filtra todos los frames y solo
+los que superan su umbral se escalan al modelo confirmador
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .inference import parse_result
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCascade:
+    """
+    Cascada de dos etapas: screener (barato) + confirmer (preciso)
+
+    El veredicto final siempre lo da el confirmer; el screener
+    solo decide qué imágenes merecen el coste del modelo grande.
+    """
+
+    def __init__(
+        self,
+        screener,
+        confirmer,
+        screener_confidence: float = 0.15,
+        confirmer_confidence: float = 0.4,
+        screener_imgsz: int = 320,
+        confirmer_imgsz: int = 640
+    ):
+        self.screener = screener
+        self.confirmer = confirmer
+        self.screener_confidence = screener_confidence
+        self.confirmer_confidence = confirmer_confidence
+        self.screener_imgsz = screener_imgsz
+        self.confirmer_imgsz = confirmer_imgsz
+
+        self._lock = threading.Lock()
+        self.screened = 0
+        self.escalated = 0
+        self.confirmed = 0
+        self.screener_time = 0.0
+        self.confirmer_time = 0.0
+
+        logger.info(
+            f"🪜 Cascada activa: screener {screener_imgsz}px (conf {screener_confidence}) → "
+            f"confirmer {confirmer_imgsz}px (conf {confirmer_confidence})"
+        )
+
+    def predict(self, images: List[np.ndarray], max_imgsz: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Ejecuta la cascada sobre un batch de imágenes
+
+        Args:
+            images: Frames o recortes BGR
+            max_imgsz: Límite del tamaño de entrada de ambas etapas (recortes pequeños)
+
+        Returns:
+            Detecciones del confirmer por imagen (vacío si no se escaló)
+        """
+        outputs: List[List[Dict]] = [[] for _ in images]
+        if not images:
+            return outputs
+
+        # Etapa 1: screener sobre todas las imágenes
+        start = time.perf_counter()
+        screened = self.screener(
+            images,
+            conf=self.screener_confidence,
+            imgsz=min(self.screener_imgsz, max_imgsz or self.screener_imgsz),
+            verbose=False
+        )
+        screener_elapsed = time.perf_counter() - start
+
+        escalate = [i for i, result in enumerate(screened) if len(result.boxes) > 0]
+
+        # Etapa 2: confirmer solo sobre lo que disparó el screener
+        confirmer_elapsed = 0.0
+        confirmed = 0
+        if escalate:
+            start = time.perf_counter()
+            results = self.confirmer(
+                [images[i] for i in escalate],
+                conf=self.confirmer_confidence,
+                imgsz=min(self.confirmer_imgsz, max_imgsz or self.confirmer_imgsz),
+                verbose=False
+            )
+            confirmer_elapsed = time.perf_counter() - start
+
+            for i, result in zip(escalate, results):
+                outputs[i] = parse_result(result, self.confirmer.names)
+                if outputs[i]:
+                    confirmed += 1
+
+        with self._lock:
+            self.screened += len(images)
+            self.escalated += len(escalate)
+            self.confirmed += confirmed
+            self.screener_time += screener_elapsed
+            self.confirmer_time += confirmer_elapsed
+
+        return outputs
+
+    def get_stats(self) -> Dict:
+        """
+        Obtiene métricas por etapa
+
+        Returns:
+            Diccionario con tasas de escalado y confirmación
+        """
+        with self._lock:
+            return {
+                "screener": {
+                    "images_processed": self.screened,
+                    "escalated": self.escalated,
+                    "escalation_rate": round(self.escalated / self.screened, 4) if self.screened else 0.0,
+                    "avg_latency_ms": round(self.screener_time * 1000 / self.screened, 2) if self.screened else 0.0,
+                    "confidence_threshold": self.screener_confidence,
+                    "imgsz": self.screener_imgsz
+                },
+                "confirmer": {
+                    "images_processed": self.escalated,
+                    "confirmed": self.confirmed,
+                    "confirmation_rate": round(self.confirmed / self.escalated, 4) if self.escalated else 0.0,
+                    "avg_latency_ms": round(self.confirmer_time * 1000 / self.escalated, 2) if self.escalated else 0.0,
+                    "confidence_threshold": self.confirmer_confidence,
+                    "imgsz": self.confirmer_imgsz
+                }
+            }
@@ -0,0 +1,266 @@
+"""
+Pool de Réplicas del Modelo - Weapon Detection
+Reparte la inferencia entre K copias del modelo, cada una con
+su propio presupuesto de hilos y (opcionalmente) núcleos fijos
+
+Benchmark para elegir K vs hilos por réplica:
+    python -m app.utils.model_pool --model ../runs/detect/train/weights/best.pt
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Importación condicional de torch (solo para fijar hilos por réplica)
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReplica:
+    """
+    Una copia del modelo con un hilo dedicado
+
+    torch.set_num_threads y sched_setaffinity se llaman dentro del
+    hilo de la réplica, así el presupuesto de hilos de OpenMP y la
+    afinidad se aplican solo a esa réplica (y a los hilos que cree).
+    """
+
+    def __init__(self, index: int, model, threads: int, cores: Optional[List[int]] = None):
+        self.index = index
+        self.model = model
+        self.threads = threads
+        self.cores = cores
+        self.in_flight = 0
+        self.processed = 0
+        self.busy_time = 0.0
+        self.executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix=f"replica-{index}",
+            initializer=self._init_thread
+        )
+
+    def _init_thread(self):
+        """Configura hilos y afinidad del hilo de la réplica"""
+        if TORCH_AVAILABLE:
+            torch.set_num_threads(self.threads)
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cores)
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo fijar afinidad de la réplica {self.index}: {e}")
+
+    def run(self, source, **kwargs):
+        """Ejecuta el modelo (se llama dentro del hilo de la réplica)"""
+        start = time.perf_counter()
+        try:
+            return self.model(source, **kwargs)
+        finally:
+            self.busy_time += time.perf_counter() - start
+            self.processed += 1
+
+
+class ModelReplicaPool:
+    """
+    Pool de K réplicas con planificación al menos cargado
+
+    Se usa igual que un modelo de ultralytics: pool(imagenes, conf=...)
+    y pool.names, así que puede reemplazar al modelo global.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        model_factory: Callable,
+        replicas: int = 2,
+        threads_per_replica: Optional[int] = None,
+        pin_cores: bool = False,
+        core_offset: int = 0
+    ):
+        """
+        Args:
+            core_offset: Primer núcleo asignado a este pool, para que varios
+                         pools (p. ej. etapas de la cascada) no compartan núcleos
+        """
+        cpu_count = os.cpu_count() or 1
+        self.model_path = model_path
+        self.threads_per_replica = threads_per_replica or max(1, cpu_count // replicas)
+        self.pin_cores = pin_cores
+        self._lock = threading.Lock()
+
+        self.replicas: List[ModelReplica] = []
+        for index in range(replicas):
+            cores = None
+            if pin_cores:
+                first = (core_offset + index * self.threads_per_replica) % cpu_count
+                cores = [(first + offset) % cpu_count for offset in range(self.threads_per_replica)]
+            self.replicas.append(
+                ModelReplica(index, model_factory(model_path), self.threads_per_replica, cores)
+            )
+
+        logger.info(
+            f"🧩 Pool de modelos: {replicas} réplica(s) x {self.threads_per_replica} hilo(s)"
+            f"{' con núcleos fijos' if pin_cores else ''}"
+        )
+
+    @property
+    def names(self) -> Dict[int, str]:
+        """Clases del modelo"""
+        return self.replicas[0].model.names
+
+    def _acquire(self) -> ModelReplica:
+        """Elige la réplica con menos trabajo en curso"""
+        with self._lock:
+            replica = min(self.replicas, key=lambda r: (r.in_flight, r.processed))
+            replica.in_flight += 1
+            return replica
+
+    def __call__(self, source, **kwargs):
+        """
+        Ejecuta la inferencia en la réplica menos cargada
+
+        Bloquea el hilo que llama hasta tener el resultado; desde
+        el event loop debe llamarse con run_in_executor.
+        """
+        replica = self._acquire()
+        try:
+            return replica.executor.submit(replica.run, source, **kwargs).result()
+        finally:
+            with self._lock:
+                replica.in_flight -= 1
+
+    def get_stats(self) -> Dict:
+        """Carga y uso de cada réplica"""
+        with self._lock:
+            return {
+                "replicas": len(self.replicas),
+                "threads_per_replica": self.threads_per_replica,
+                "pin_cores": self.pin_cores,
+                "per_replica": [
+                    {
+                        "index": r.index,
+                        "in_flight": r.in_flight,
+                        "processed": r.processed,
+                        "avg_latency_ms": round(r.busy_time * 1000 / r.processed, 2) if r.processed else 0.0,
+                        "cores": r.cores
+                    }
+                    for r in self.replicas
+                ]
+            }
+
+    def shutdown(self):
+        """Detiene los hilos de las réplicas"""
+        for replica in self.replicas:
+            replica.executor.shutdown(wait=False)
+
+
+def benchmark(
+    model_path: str,
+    model_factory: Callable,
+    configs: List[tuple],
+    frames: int = 200,
+    imgsz: int = 640,
+    pin_cores: bool = False
+) -> List[Dict]:
+    """
+    Mide throughput y latencia para distintas combinaciones K x hilos
+
+    Args:
+        model_path: Ruta al modelo
+        model_factory: Función que carga el modelo (p. ej. YOLO)
+        configs: Lista de (réplicas, hilos_por_réplica)
+        frames: Frames a procesar por configuración
+        imgsz: Tamaño de los frames sintéticos
+        pin_cores: Fijar núcleos por réplica
+
+    Returns:
+        Lista de resultados por configuración
+    """
+    frame = np.random.randint(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    results = []
+
+    for replicas, threads in configs:
+        pool = ModelReplicaPool(model_path, model_factory, replicas, threads, pin_cores)
+
+        # Calentamiento
+        for _ in range(replicas):
+            pool(frame, verbose=False)
+
+        latencies = []
+        latencies_lock = threading.Lock()
+
+        def call():
+            start = time.perf_counter()
+            pool(frame, verbose=False)
+            with latencies_lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        # Dos clientes por réplica para mantenerlas ocupadas
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=replicas * 2) as clients:
+            for _ in range(frames):
+                clients.submit(call)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        latencies.sort()
+        results.append({
+            "replicas": replicas,
+            "threads_per_replica": threads,
+            "fps": round(frames / elapsed, 2),
+            "p50_ms": round(latencies[len(latencies) // 2], 2),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2)
+        })
+
+    return results
+
+
+def _default_configs(cpu_count: int) -> List[tuple]:
+    """Combinaciones K x hilos que usan todos los núcleos"""
+    configs = []
+    replicas = 1
+    while replicas <= cpu_count:
+        configs.append((replicas, cpu_count // replicas))
+        replicas *= 2
+    return configs
+
+
+if __name__ == "__main__":
+    from ultralytics import YOLO
+
+    parser = argparse.ArgumentParser(description="Benchmark de réplicas del modelo")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "../runs/detect/train/weights/best.pt"))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--configs", help="Lista KxH separada por comas, p. ej. 1x32,4x8,8x4")
+    parser.add_argument("--pin-cores", action="store_true")
+    args = parser.parse_args()
+
+    if args.configs:
+        configs = [tuple(int(v) for v in c.split("x")) for c in args.configs.split(",")]
+    else:
+        configs = _default_configs(os.cpu_count() or 1)
+
+    rows = benchmark(args.model, YOLO, configs, args.frames, args.imgsz, args.pin_cores)
+
+    print(f"\n{'K':>4} {'hilos':>6} {'fps':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for row in rows:
+        print(
+            f"{row['replicas']:>4} {row['threads_per_replica']:>6} {row['fps']:>9} "
+            f"{row['p50_ms']:>9} {row['p95_ms']:>9}"
+        )
+    best = max(rows, key=lambda r: r["fps"])
+    print(
+        f"\n✅ Mejor throughput: MODEL_REPLICAS={best['replicas']} "
+        f"THREADS_PER_REPLICA={best['threads_per_replica']}"
+    )
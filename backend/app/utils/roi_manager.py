@@ -0,0 +1,205 @@
+"""
+Regiones de Interés (ROI) - Weapon Detection
+Gestiona polígonos por cámara para recortar la inferencia
+y descartar detecciones fuera de las zonas vigiladas
+"""
+
+import logging
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Polígono en coordenadas normalizadas (0-1) respecto al frame
+Polygon = List[Tuple[float, float]]
+
+
+class RegionOfInterestManager:
+    """
+    Gestor de regiones de interés por cámara
+
+    Los polígonos se guardan normalizados (0-1) para que sirvan
+    con cualquier resolución que envíe la cámara.
+    """
+
+    def __init__(self, crop_padding: int = 16, max_cost_ratio: float = 0.6, stride: int = 32):
+        self.crop_padding = crop_padding  # píxeles extra alrededor de cada recorte
+        self.max_cost_ratio = max_cost_ratio  # recortar solo si cuesta menos que esta fracción del frame
+        self.stride = stride  # los tamaños de entrada de YOLO son múltiplos del stride
+        self._regions: Dict[str, List[Polygon]] = {}
+        self._lock = threading.Lock()
+
+    def set_regions(self, camera_id: str, polygons: List[Polygon]):
+        """
+        Define las regiones de interés de una cámara
+
+        Args:
+            camera_id: Identificador de la cámara
+            polygons: Lista de polígonos [(x, y), ...] normalizados (0-1)
+
+        Raises:
+            ValueError: Si algún polígono es inválido
+        """
+        cleaned = []
+        for polygon in polygons:
+            if len(polygon) < 3:
+                raise ValueError("Cada polígono necesita al menos 3 puntos")
+            points = []
+            for point in polygon:
+                if len(point) != 2:
+                    raise ValueError("Cada punto debe tener la forma [x, y]")
+                x, y = float(point[0]), float(point[1])
+                if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+                    raise ValueError("Las coordenadas deben estar normalizadas entre 0 y 1")
+                points.append((x, y))
+            cleaned.append(points)
+
+        with self._lock:
+            if cleaned:
+                self._regions[camera_id] = cleaned
+            else:
+                self._regions.pop(camera_id, None)
+
+        logger.info(f"🗺️ ROI actualizada para cámara {camera_id}: {len(cleaned)} polígono(s)")
+
+    def get_regions(self, camera_id: str) -> List[Polygon]:
+        """Obtiene las regiones de interés de una cámara"""
+        with self._lock:
+            return list(self._regions.get(camera_id, []))
+
+    def clear_regions(self, camera_id: str) -> bool:
+        """Elimina las regiones de una cámara (vuelve a analizar el frame completo)"""
+        with self._lock:
+            removed = self._regions.pop(camera_id, None) is not None
+        if removed:
+            logger.info(f"🗺️ ROI eliminada para cámara {camera_id}")
+        return removed
+
+    def has_regions(self, camera_id: Optional[str]) -> bool:
+        """Indica si la cámara tiene regiones configuradas"""
+        if not camera_id:
+            return False
+        with self._lock:
+            return camera_id in self._regions
+
+    def get_all(self) -> Dict[str, List[Polygon]]:
+        """Devuelve todas las regiones configuradas"""
+        with self._lock:
+            return {camera: list(polys) for camera, polys in self._regions.items()}
+
+    def _to_pixels(self, camera_id: str, content_rect: Tuple[int, int, int, int]) -> List[np.ndarray]:
+        """Convierte los polígonos normalizados a píxeles dentro de `content_rect`"""
+        x0, y0, width, height = content_rect
+        return [
+            np.array(
+                [[x0 + int(round(x * (width - 1))), y0 + int(round(y * (height - 1)))] for x, y in polygon],
+                dtype=np.int32
+            )
+            for polygon in self.get_regions(camera_id)
+        ]
+
+    def get_crops(
+        self,
+        img: np.ndarray,
+        camera_id: str,
+        content_rect: Optional[Tuple[int, int, int, int]] = None
+    ) -> List[Tuple[int, int, np.ndarray]]:
+        """
+        Recorta el frame a los rectángulos que envuelven las regiones
+
+        Los rectángulos que se solapan se fusionan para no analizar
+        dos veces los mismos píxeles ni duplicar detecciones.
+
+        Args:
+            img: Frame completo (BGR)
+            camera_id: Identificador de la cámara
+            content_rect: Zona (x, y, ancho, alto) de `img` con el frame real
+                          si está en letterbox; por defecto la imagen completa
+
+        Returns:
+            Lista de (offset_x, offset_y, recorte)
+        """
+        height, width = img.shape[:2]
+        pad = self.crop_padding
+
+        rects = []
+        for polygon in self._to_pixels(camera_id, content_rect or (0, 0, width, height)):
+            x, y, w, h = cv2.boundingRect(polygon)
+            rects.append([
+                max(0, x - pad),
+                max(0, y - pad),
+                min(width, x + w + pad),
+                min(height, y + h + pad)
+            ])
+
+        # Fusionar rectángulos solapados hasta que no quede ninguno
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        return [(x1, y1, img[y1:y2, x1:x2]) for x1, y1, x2, y2 in rects if x2 > x1 and y2 > y1]
+
+    def crop_imgsz(self, crops: List[Tuple[int, int, np.ndarray]], full_imgsz: int = 640) -> Optional[int]:
+        """
+        Tamaño de entrada para inferir los recortes sin reescalarlos a 640
+
+        YOLO lleva cada imagen del batch a un cuadrado de `imgsz`, así
+        que el coste del batch es len(crops) * imgsz². Si no es
+        claramente menor que inferir el frame completo, conviene
+        analizar el frame entero y solo filtrar por ROI.
+
+        Args:
+            crops: Recortes devueltos por get_crops
+            full_imgsz: Tamaño de entrada usado para el frame completo
+
+        Returns:
+            imgsz (múltiplo del stride, máximo full_imgsz) o None si no conviene recortar
+        """
+        longest = max(max(crop.shape[:2]) for _, _, crop in crops)
+        imgsz = min(full_imgsz, math.ceil(longest / self.stride) * self.stride)
+        if len(crops) * imgsz ** 2 >= self.max_cost_ratio * full_imgsz ** 2:
+            return None
+        return imgsz
+
+    def filter_detections(
+        self,
+        detections: List[Dict],
+        camera_id: str,
+        content_rect: Tuple[int, int, int, int]
+    ) -> List[Dict]:
+        """
+        Descarta detecciones cuyo centro cae fuera de las regiones
+
+        Args:
+            detections: Detecciones con "bbox" [x1, y1, x2, y2] en píxeles de la imagen
+            camera_id: Identificador de la cámara
+            content_rect: Zona (x, y, ancho, alto) de la imagen con el frame real
+
+        Returns:
+            Detecciones dentro de alguna región
+        """
+        polygons = self._to_pixels(camera_id, content_rect)
+        if not polygons:
+            return detections
+
+        kept = []
+        for det in detections:
+            x1, y1, x2, y2 = det["bbox"]
+            center = (float(x1 + x2) / 2, float(y1 + y2) / 2)
+            if any(cv2.pointPolygonTest(polygon, center, False) >= 0 for polygon in polygons):
+                kept.append(det)
+        return kept
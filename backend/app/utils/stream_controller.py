@@ -0,0 +1,131 @@
+"""
+Control Adaptativo de Stream - Weapon Detection
+Ajusta fps, resolución y calidad JPEG que debe usar cada cliente
+según la latencia de inferencia y el retraso de la cola
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StreamRateController:
+    """
+    Controlador por conexión WebSocket (AIMD)
+
+    Sube el fps de a poco cuando el servidor está libre y lo baja
+    de forma multiplicativa ante carga o retraso. Tras una detección
+    pide calidad máxima durante unos segundos.
+    """
+
+    def __init__(
+        self,
+        min_fps: float = 1.0,
+        max_fps: float = 15.0,
+        initial_fps: float = 5.0,
+        max_resolution: int = 640,
+        boost_resolution: int = 1280,
+        jpeg_quality: int = 70,
+        boost_jpeg_quality: int = 95,
+        boost_seconds: float = 5.0,
+        max_lag_ms: float = 300.0,
+        update_interval: float = 2.0
+    ):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.target_fps = initial_fps
+        self.max_resolution = max_resolution
+        self.boost_resolution = boost_resolution
+        self.jpeg_quality = jpeg_quality
+        self.boost_jpeg_quality = boost_jpeg_quality
+        self.boost_seconds = boost_seconds
+        self.max_lag_ms = max_lag_ms
+        self.update_interval = update_interval  # segundos mínimos entre ajustes de fps
+
+        self.avg_inference_ms = None
+        self.avg_lag_ms = 0.0
+        self._lag_baseline = None  # compensa la diferencia de reloj cliente/servidor
+        self._boost_until = 0.0
+        self._last_adjust = 0.0
+        self._last_sent: Optional[Dict] = None
+
+    def _smooth(self, current: Optional[float], value: float, alpha: float = 0.3) -> float:
+        """Media móvil exponencial"""
+        return value if current is None else alpha * value + (1 - alpha) * current
+
+    def record_frame(
+        self,
+        inference_ms: float,
+        sent_at_ms: Optional[float] = None,
+        received_at_ms: Optional[float] = None,
+        detected: bool = False,
+        active_streams: int = 1,
+        capacity: int = 1
+    ) -> Optional[Dict]:
+        """
+        Registra un frame procesado y decide si hay que enviar un ajuste
+
+        Args:
+            inference_ms: Tiempo de procesamiento del frame en el servidor
+            sent_at_ms: Timestamp (epoch ms) en que el cliente envió el frame
+            received_at_ms: Timestamp (epoch ms) en que el servidor lo empezó a procesar
+            detected: Si el frame tuvo detecciones
+            active_streams: Conexiones que comparten el modelo
+            capacity: Inferencias que el servidor atiende en paralelo (réplicas del modelo)
+
+        Returns:
+            Mensaje de control si los parámetros cambiaron, None si no
+        """
+        now = time.monotonic()
+        self.avg_inference_ms = self._smooth(self.avg_inference_ms, inference_ms)
+
+        # Retraso de cola relativo al mínimo observado (independiente del reloj del cliente)
+        if sent_at_ms is not None and received_at_ms is not None:
+            raw_lag = received_at_ms - sent_at_ms
+            if self._lag_baseline is None or raw_lag < self._lag_baseline:
+                self._lag_baseline = raw_lag
+            self.avg_lag_ms = self._smooth(self.avg_lag_ms, raw_lag - self._lag_baseline)
+
+        if detected:
+            self._boost_until = now + self.boost_seconds
+
+        if now - self._last_adjust >= self.update_interval:
+            self._last_adjust = now
+            self._adjust_fps(active_streams, capacity)
+
+        return self._build_message(now)
+
+    def _adjust_fps(self, active_streams: int, capacity: int = 1):
+        """Ajuste AIMD del fps objetivo"""
+        # Fracción del tiempo de inferencia (repartido entre las réplicas) que
+        # consumen todas las cámaras a este fps
+        utilization = (
+            self.target_fps * self.avg_inference_ms * max(active_streams, 1)
+            / (1000 * max(capacity, 1))
+        )
+
+        if utilization > 0.9 or self.avg_lag_ms > self.max_lag_ms:
+            self.target_fps = max(self.min_fps, self.target_fps * 0.7)
+        elif utilization < 0.6 and self.avg_lag_ms < self.max_lag_ms / 3:
+            self.target_fps = min(self.max_fps, self.target_fps + 1)
+
+    def initial_message(self) -> Dict:
+        """Mensaje de control con los parámetros iniciales de captura"""
+        return self._build_message(time.monotonic(), force=True)
+
+    def _build_message(self, now: float, force: bool = False) -> Optional[Dict]:
+        """Construye el mensaje de control solo si algo cambió"""
+        boosting = now < self._boost_until
+        settings = {
+            "target_fps": round(self.target_fps, 1),
+            "max_resolution": self.boost_resolution if boosting else self.max_resolution,
+            "jpeg_quality": self.boost_jpeg_quality if boosting else self.jpeg_quality
+        }
+
+        if settings == self._last_sent and not force:
+            return None
+
+        self._last_sent = settings
+        return {"type": "control", "boost": boosting, **settings}
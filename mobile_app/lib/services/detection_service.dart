@@ -1,4 +1,5 @@
 import 'dart:convert';
+import 'dart:math';
 import 'dart:typed_data';
 import 'package:flutter/foundation.dart';
 import 'package:http/http.dart' as http;
@@ -25,12 +26,19 @@ class DetectionService extends ChangeNotifier {
   int _totalFramesProcessed = 0;
   int _totalDetections = 0;
 
+  // Parámetros de captura que indica el servidor (mensajes "control")
+  double _targetFps = 5.0;
+  int _maxResolution = 640;
+  int _jpegQuality = 85;
+  DateTime _lastFrameSent = DateTime.fromMillisecondsSinceEpoch(0);
+
   // Getters
   bool get isConnected => _isConnected;
   bool get isProcessing => _isProcessing;
   DetectionResult? get lastDetection => _lastDetection;
   int get totalFramesProcessed => _totalFramesProcessed;
   int get totalDetections => _totalDetections;
+  double get targetFps => _targetFps;
 
   /// Inicializa conexión WebSocket para streaming en tiempo real
   Future<void> connectWebSocket() async {
@@ -82,8 +90,14 @@ class DetectionService extends ChangeNotifier {
 
     if (_isProcessing) return; // Evitar sobrecarga
 
+    // Respetar el fps que pide el servidor
+    final now = DateTime.now();
+    final minInterval = Duration(milliseconds: (1000 / _targetFps).round());
+    if (now.difference(_lastFrameSent) < minInterval) return;
+
     try {
       _isProcessing = true;
+      _lastFrameSent = now;
 
       // Convertir CameraImage a JPEG base64
       final jpegBase64 = await _convertCameraImageToJpegBase64(image);
@@ -91,6 +105,7 @@ class DetectionService extends ChangeNotifier {
       // Enviar al servidor
       final payload = jsonEncode({
         'frame': jpegBase64,
+        'sent_at': DateTime.now().millisecondsSinceEpoch,
         'alert_config': {
           'fcm_token': AppConfig.fcmToken,
           'enable_push': AppConfig.enablePushNotifications,
@@ -113,6 +128,13 @@ class DetectionService extends ChangeNotifier {
   void _handleWebSocketMessage(dynamic data) {
     try {
       final json = jsonDecode(data);
+
+      // Ajustes de tasa/calidad enviados por el servidor
+      if (json['type'] == 'control') {
+        _applyControlMessage(json);
+        return;
+      }
+
       final result = DetectionResult.fromJson(json);
 
       _lastDetection = result;
@@ -127,6 +149,14 @@ class DetectionService extends ChangeNotifier {
     }
   }
 
+  /// Aplica los parámetros de captura indicados por el servidor
+  void _applyControlMessage(Map<String, dynamic> json) {
+    _targetFps = (json['target_fps'] as num?)?.toDouble() ?? _targetFps;
+    _maxResolution = json['max_resolution'] ?? _maxResolution;
+    _jpegQuality = json['jpeg_quality'] ?? _jpegQuality;
+    print('⚙️ Control: ${_targetFps}fps, ${_maxResolution}px, calidad $_jpegQuality');
+  }
+
   /// Detecta armas en una imagen única vía HTTP
   Future<DetectionResult?> detectInImage(Uint8List imageBytes) async {
     try {
@@ -208,11 +238,12 @@ class DetectionService extends ChangeNotifier {
         }
       }
 
-      // Redimensionar para optimizar (640x640 es ideal para YOLO)
-      final resized = img.copyResize(imgLib, width: 640, height: 640);
+      // Redimensionar a la resolución máxima que pide el servidor
+      final size = min(_maxResolution, max(width, height));
+      final resized = img.copyResize(imgLib, width: size, height: size);
 
-      // Convertir a JPEG
-      final jpeg = img.encodeJpg(resized, quality: 85);
+      // Convertir a JPEG con la calidad que pide el servidor
+      final jpeg = img.encodeJpg(resized, quality: _jpegQuality);
 
       // Convertir a base64
       return base64Encode(jpeg);